@@ -7,6 +7,21 @@ OBJECT_BRANCH = 5
 PIPELINE_SKY = 0
 PIPELINE_3D = 1
 
+#vertex and fragment shader source files for each pipeline
+SHADER_SOURCES = {
+    PIPELINE_SKY: ("shaders/vertex_sky.txt", "shaders/fragment_sky.txt"),
+    PIPELINE_3D: ("shaders/vertex.txt", "shaders/fragment.txt")
+}
+
+#size in bytes of the buffer every mesh's vertices are kept in
+VERTEX_POOL_SIZE = 1 << 20
+
+#uniform buffer binding point of the camera's data
+CAMERA_BLOCK_BINDING = 0
+
+#frames of instance data in flight, each gets its own part of the buffer
+INSTANCE_BUFFER_FRAMES = 3
+
 EVENT_NEW = 1
 EVENT_DEL = 2
 
@@ -21,6 +36,10 @@ BRANCH_SPLIT_X_ROTATION = 30
 
 MAX_DEPTH = 10
 
+#growth per frame of the tree's root radius, and of each branch's height
+ROOT_GROWTH_RATE = 0.00001
+BRANCH_GROWTH_RATE = 0.001
+
 SPLIT_CHANCE = 0.25
 LEAF_GROWING_MAX_RADIUS = 0.2
 MIN_EXTEND_RADIUS = 0.05
\ No newline at end of file
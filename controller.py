@@ -1,3 +1,5 @@
+import math
+
 import glfw
 import glfw.GLFW as GLFW_CONSTANTS
 import numpy as np
@@ -38,11 +40,13 @@ class App:
             GLFW_CONSTANTS.GLFW_OPENGL_FORWARD_COMPAT, 
             GLFW_CONSTANTS.GLFW_TRUE
         )
-        glfw.window_hint(GLFW_CONSTANTS.GLFW_DOUBLEBUFFER, False)
+        glfw.window_hint(GLFW_CONSTANTS.GLFW_DOUBLEBUFFER, True)
         self.window = glfw.create_window(
             self.screenWidth, self.screenHeight, "Title", None, None
         )
         glfw.make_context_current(self.window)
+        #wait for vsync when swapping buffers
+        glfw.swap_interval(1)
 
     def make_objects(self) -> None:
         """ Make any object used by the App"""
@@ -55,16 +59,24 @@ class App:
     def set_up_input_systems(self) -> None:
         """ Run any mouse/keyboard configuration here. """
 
+        #a disabled cursor is hidden and kept in the window by glfw
         glfw.set_input_mode(
             self.window, 
             GLFW_CONSTANTS.GLFW_CURSOR, 
-            GLFW_CONSTANTS.GLFW_CURSOR_HIDDEN
-        )
-        glfw.set_cursor_pos(
-            self.window,
-            self.screenWidth // 2, 
-            self.screenHeight // 2
+            GLFW_CONSTANTS.GLFW_CURSOR_DISABLED
         )
+        if glfw.raw_mouse_motion_supported():
+            glfw.set_input_mode(
+                self.window,
+                GLFW_CONSTANTS.GLFW_RAW_MOUSE_MOTION,
+                GLFW_CONSTANTS.GLFW_TRUE
+            )
+
+        #mouse movement is summed up as events arrive, then used once per frame
+        (self.lastMouseX, self.lastMouseY) = glfw.get_cursor_pos(self.window)
+        self.mouseDX = 0
+        self.mouseDY = 0
+        glfw.set_cursor_pos_callback(self.window, self.on_mouse_moved)
 
         self.walk_offset_lookup = {
             1: 0,
@@ -80,6 +92,15 @@ class App:
             13: 270,
             14: 180
         }
+
+        # cos/sin of each walk offset, these get combined with the
+        # camera's yaw in handleKeys using the angle addition identities.
+        self.walk_direction_lookup = {
+            combo: (math.cos(math.radians(offset)), math.sin(math.radians(offset)))
+            for combo, offset in self.walk_offset_lookup.items()
+        }
+        self.dPos = np.zeros(3, dtype=np.float32)
+        self.dEulers = np.zeros(3, dtype=np.float32)
     
     def set_up_timer(self) -> None:
         """
@@ -88,7 +109,9 @@ class App:
         self.lastTime = glfw.get_time()
         self.currentTime = 0
         self.numFrames = 0
-        self.frameTime = 0
+
+        self.previousFrameTime = self.lastTime
+        self.rate = 1
     
     def mainLoop(self) -> None:
         """ Run the App """
@@ -100,19 +123,30 @@ class App:
             if glfw.window_should_close(self.window) \
                 or glfw.get_key(self.window, GLFW_CONSTANTS.GLFW_KEY_ESCAPE) == GLFW_CONSTANTS.GLFW_PRESS:
                 running = False
+
+            self.calculate_rate()
             
-            self.handleKeys()
-            self.handleMouse()
+            visible = not glfw.get_window_attrib(
+                self.window, GLFW_CONSTANTS.GLFW_ICONIFIED
+            )
 
-            glfw.poll_events()
+            if visible:
+                self.handleKeys()
+                self.handleMouse()
+
+                glfw.poll_events()
+            else:
+                #nothing to draw, so wait out a frame instead of spinning
+                glfw.wait_events_timeout(1 / 60)
 
             #update scene
-            self.scene.update(self.frameTime / 16.667)
+            self.scene.update(self.rate)
             
-            self.renderer.render(
-                camera = self.scene.camera,
-                renderables = self.scene.renderables
-            )
+            if visible:
+                self.renderer.render(
+                    camera = self.scene.camera,
+                    renderables = self.scene.renderables
+                )
 
             #timing
             self.calcuateFramerate()
@@ -124,57 +158,64 @@ class App:
             Handle keys.
         """
 
-        combo = 0
-        directionModifier = 0
-
-        if glfw.get_key(
-            self.window, GLFW_CONSTANTS.GLFW_KEY_W
-            ) == GLFW_CONSTANTS.GLFW_PRESS:
-            combo += 1
-        elif glfw.get_key(
-            self.window, GLFW_CONSTANTS.GLFW_KEY_A
-            ) == GLFW_CONSTANTS.GLFW_PRESS:
-            combo += 2
-        elif glfw.get_key(
-            self.window, GLFW_CONSTANTS.GLFW_KEY_S
-            ) == GLFW_CONSTANTS.GLFW_PRESS:
-            combo += 4
-        elif glfw.get_key(
-            self.window, GLFW_CONSTANTS.GLFW_KEY_D
-            ) == GLFW_CONSTANTS.GLFW_PRESS:
-            combo += 8
+        #read all four keys so diagonals combine: W = 1, A = 2, S = 4, D = 8
+        press = GLFW_CONSTANTS.GLFW_PRESS
+        w = glfw.get_key(self.window, GLFW_CONSTANTS.GLFW_KEY_W) == press
+        a = glfw.get_key(self.window, GLFW_CONSTANTS.GLFW_KEY_A) == press
+        s = glfw.get_key(self.window, GLFW_CONSTANTS.GLFW_KEY_S) == press
+        d = glfw.get_key(self.window, GLFW_CONSTANTS.GLFW_KEY_D) == press
+        combo = w | (a << 1) | (s << 2) | (d << 3)
         
-        if combo in self.walk_offset_lookup:
+        if combo in self.walk_direction_lookup:
 
-            directionModifier = self.walk_offset_lookup[combo]
-            
-            dPos = 0.1 * np.array(
-                [
-                    np.cos(np.deg2rad(self.scene.camera.eulers[2] + directionModifier)),
-                    np.sin(np.deg2rad(self.scene.camera.eulers[2] + directionModifier)),
-                    0
-                ],
-                dtype = np.float32
-            )
+            cos_offset, sin_offset = self.walk_direction_lookup[combo]
+            yaw = math.radians(self.scene.camera.eulers[2])
+            cos_yaw = math.cos(yaw)
+            sin_yaw = math.sin(yaw)
+
+            self.dPos[0] = 0.1 * (cos_yaw * cos_offset - sin_yaw * sin_offset)
+            self.dPos[1] = 0.1 * (sin_yaw * cos_offset + cos_yaw * sin_offset)
 
-            self.scene.move_camera(dPos)
+            self.scene.move_camera(self.dPos)
 
     def handleMouse(self) -> None:
         """
             Handle mouse movement.
         """
 
-        (x,y) = glfw.get_cursor_pos(self.window)
-        rate = self.frameTime / 16.667
-        theta_increment = rate * ((self.screenWidth / 2.0) - x)
-        phi_increment = rate * ((self.screenHeight / 2.0) - y)
-        dEulers = np.array([0, phi_increment, theta_increment], dtype=np.float32)
-        self.scene.spin_camera(dEulers)
-        glfw.set_cursor_pos(self.window, self.screenWidth // 2, self.screenHeight // 2)
+        #the movement is already what happened over this frame,
+        #so it isn't scaled by the frame rate
+        self.dEulers[1] = -self.mouseDY
+        self.dEulers[2] = -self.mouseDX
+        self.mouseDX = 0
+        self.mouseDY = 0
+        self.scene.spin_camera(self.dEulers)
+
+    def on_mouse_moved(self, window, x: float, y: float) -> None:
+        """
+            Cursor position callback, adds the movement since
+            the last event to this frame's mouse movement.
+        """
+
+        self.mouseDX += x - self.lastMouseX
+        self.mouseDY += y - self.lastMouseY
+        self.lastMouseX = x
+        self.lastMouseY = y
+
+    def calculate_rate(self) -> None:
+        """
+            Measure the time since the last frame as a rate, used to
+            scale per-frame updates (1 when running at 60fps). The
+            frame time is clamped so a single stall can't cause a jump.
+        """
+
+        now = glfw.get_time()
+        self.rate = 60 * min(max(now - self.previousFrameTime, 0), 0.1)
+        self.previousFrameTime = now
 
     def calcuateFramerate(self) -> None:
         """
-            Calculate the framerate and frametime
+            Calculate the framerate, and show it in the window title
         """
 
         self.currentTime = glfw.get_time()
@@ -184,7 +225,6 @@ class App:
             glfw.set_window_title(self.window, f"Running at {framerate} fps.")
             self.lastTime = self.currentTime
             self.numFrames = -1
-            self.frameTime = float(1000.0 / max(60,framerate))
         self.numFrames += 1
     
     def quit(self):
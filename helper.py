@@ -1,10 +1,32 @@
+import array
+import hashlib
+import os
+import struct
+from typing import Optional
+
+import numpy as np
 from OpenGL.GL import *
 from OpenGL.GL.shaders import compileProgram,compileShader
 
+SHADER_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "GraphicsProject", "shaders"
+)
+
+#read only binaries shipped with the app, made by tools/warm_shader_cache.py
+BUNDLED_SHADER_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "cache", "shaders"
+)
+
 def createShader(vertexFilepath: str, fragmentFilepath: str) -> int:
     """
         Compile and link a shader program from source.
 
+        Linked programs are cached on disk as driver binaries, keyed
+        by the shader sources and the driver, so later runs can load
+        the program without compiling it. Binaries bundled with the
+        app are tried before the user's cache.
+
         Parameters:
 
             vertexFilepath: filepath to the vertex shader source code (relative to this file)
@@ -16,46 +38,254 @@ def createShader(vertexFilepath: str, fragmentFilepath: str) -> int:
             An integer, being a handle to the shader location on the graphics card
     """
 
-    with open(vertexFilepath,'r') as f:
-        vertex_src = f.readlines()
+    with open(vertexFilepath,'rb') as f:
+        vertex_src = f.read()
+
+    with open(fragmentFilepath,'rb') as f:
+        fragment_src = f.read()
 
-    with open(fragmentFilepath,'r') as f:
-        fragment_src = f.readlines()
+    use_cache = shader_binaries_supported()
+    if use_cache:
+        for directory in (BUNDLED_SHADER_CACHE_DIR, SHADER_CACHE_DIR):
+            shader = load_cached_shader(
+                get_shader_cache_path(vertex_src, fragment_src, directory))
+            if shader is not None:
+                return shader
     
     shader = compileProgram(compileShader(vertex_src, GL_VERTEX_SHADER),
                             compileShader(fragment_src, GL_FRAGMENT_SHADER),
-                            validate = False
+                            validate = False,
+                            retrievable = use_cache
                         )
+
+    if use_cache:
+        save_cached_shader(
+            shader, get_shader_cache_path(vertex_src, fragment_src))
     
     return shader
 
-def load_model_from_file(
-    filename: str) -> list[float]:
+def shader_binaries_supported() -> bool:
+    """ 
+        Returns whether the driver can hand back and reload
+        linked program binaries.
+    """
+
+    try:
+        return glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) > 0
+    except GLError:
+        return False
+
+def texture_storage_supported() -> bool:
+    """
+        Returns whether immutable texture storage (glTexStorage2D)
+        can be used, it's core from 4.2 and an extension before that.
+    """
+
+    if (glGetIntegerv(GL_MAJOR_VERSION), glGetIntegerv(GL_MINOR_VERSION)) >= (4, 2):
+        return True
+
+    return any(
+        glGetStringi(GL_EXTENSIONS, i) == b"GL_ARB_texture_storage"
+        for i in range(glGetIntegerv(GL_NUM_EXTENSIONS))
+    )
+
+def get_shader_cache_path(
+    vertex_src: bytes, fragment_src: bytes,
+    directory: Optional[str] = None) -> str:
+    """
+        Returns the cache file for a program built from the given sources,
+        in the given directory (the user's cache by default).
+
+        The driver's vendor, renderer and version are part of the key,
+        binaries from an older driver are never loaded.
+    """
+
+    key = hashlib.sha1(b"\0".join((
+        vertex_src, fragment_src,
+        glGetString(GL_VENDOR), glGetString(GL_RENDERER), glGetString(GL_VERSION)
+    ))).hexdigest()
+
+    if directory is None:
+        directory = SHADER_CACHE_DIR
+
+    return os.path.join(directory, f"{key}.bin")
+
+def load_cached_shader(cache_path: str) -> Optional[int]:
+    """
+        Create a program from the cached binary at the given path.
+
+        Returns None if there is no cached binary or the driver rejects it.
+    """
+
+    try:
+        with open(cache_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) <= 4:
+        return None
+
+    (binary_format,) = struct.unpack_from("<I", data)
+    binary = data[4:]
+    shader = glCreateProgram()
+    try:
+        glProgramBinary(shader, binary_format, binary, len(binary))
+        if glGetProgramiv(shader, GL_LINK_STATUS) == GL_TRUE:
+            return shader
+    except GLError:
+        pass
+
+    glDeleteProgram(shader)
+    return None
+
+def save_cached_shader(shader: int, cache_path: str) -> None:
+    """
+        Write the shader's program binary to the given path, the file
+        is written under a temporary name then renamed into place.
+    """
+
+    try:
+        length = glGetProgramiv(shader, GL_PROGRAM_BINARY_LENGTH)
+        binary, binary_format, _ = glGetProgramBinary(shader, length)
+        os.makedirs(os.path.dirname(cache_path), exist_ok = True)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(struct.pack("<I", binary_format))
+            f.write(binary.tobytes())
+        os.replace(temp_path, cache_path)
+    except (GLError, OSError):
+        pass
+
+def load_model_from_file(filename: str) -> np.ndarray:
     """ 
-        Read the given obj file and return a list of all the
-        vertex data.
+        Read the given obj file and return its vertex data as a flat
+        float32 array of interleaved (x, y, z, s, t, nx, ny, nz) values.
+
+        Attribute blocks are parsed in bulk with numpy and faces are
+        gathered with fancy indexing. Files the bulk parser can't
+        handle (eg. faces without texcoords) go through the line by
+        line reader instead.
+    """
+
+    with open(filename,'r') as f:
+        lines = f.read().splitlines()
+
+    try:
+        return read_model_bulk(lines)
+    except ValueError:
+        return read_model_lines(lines)
+
+def pack_vertex_data(vertices: np.ndarray) -> np.ndarray:
+    """
+        Pack flat (x, y, z, s, t, nx, ny, nz) vertex data into
+        20 byte vertices: a float32 position, half float texcoords
+        and the normal as signed, normalized 10 bit components
+        (GL_INT_2_10_10_10_REV, with the 2 bit w left as 0).
+    """
+
+    vertices = vertices.reshape(-1, 8)
+
+    packed = np.empty(
+        len(vertices),
+        dtype = [("position", "<f4", 3), ("texcoord", "<f2", 2), ("normal", "<u4")]
+    )
+    packed["position"] = vertices[:, 0:3]
+    packed["texcoord"] = vertices[:, 3:5]
+
+    normal = np.round(np.clip(vertices[:, 5:8], -1, 1) * 511).astype(np.int32) & 0x3FF
+    packed["normal"] = normal[:, 0] | (normal[:, 1] << 10) | (normal[:, 2] << 20)
+
+    return packed
+
+def read_model_bulk(lines: list[str]) -> np.ndarray:
+    """
+        Parse the lines of an obj file in bulk and return the
+        interleaved vertex data.
+
+        Raises ValueError if the file uses anything other than
+        v, vt, vn data with full v/vt/vn face corners.
+    """
+
+    prefixes = np.array([line.split(" ", 1)[0] for line in lines])
+
+    v = read_attribute_block(lines, prefixes, "v", 3)
+    vt = read_attribute_block(lines, prefixes, "vt", 2)
+    vn = read_attribute_block(lines, prefixes, "vn", 3)
+
+    faces = [lines[i].split()[1:] for i in np.flatnonzero(prefixes == "f")]
+    corner_counts = np.array([len(face) for face in faces], dtype=np.int64)
+
+    # Each face is fanned out into (corners - 2) triangles, work out
+    # where each face's triangles start in the final corner list
+    # so that faces of different sizes keep their file order.
+    triangle_corners = 3 * (corner_counts - 2)
+    starts = np.cumsum(triangle_corners) - triangle_corners
+    indices = np.empty((triangle_corners.sum(), 3), dtype=np.int64)
+
+    for count in np.unique(corner_counts):
+        group = np.flatnonzero(corner_counts == count)
+        description = " ".join(" ".join(faces[i]) for i in group)
+        if "//" in description or description.count("/") != 2 * count * len(group):
+            raise ValueError("face corners must be of the form v/vt/vn")
+        corners = np.fromstring(
+            description.replace("/", " "), dtype=np.int64, sep=" "
+        ).reshape(len(group), count, 3) - 1
+
+        fan = np.stack(
+            [corners[:, [0, i + 1, i + 2]] for i in range(count - 2)],
+            axis=1
+        ).reshape(len(group), -1, 3)
+        targets = starts[group, None] + np.arange(fan.shape[1])
+        indices[targets] = fan
+
+    return np.concatenate(
+        [v[indices[:, 0]], vt[indices[:, 1]], vn[indices[:, 2]]],
+        axis=1
+    ).astype(np.float32).ravel()
+
+def read_attribute_block(
+    lines: list[str], prefixes: np.ndarray,
+    prefix: str, size: int) -> np.ndarray:
+    """
+        Parse every line starting with the given prefix
+        and return the values as a (count, size) array.
+    """
+
+    block = [lines[i][len(prefix):] for i in np.flatnonzero(prefixes == prefix)]
+    values = np.fromstring(" ".join(block), dtype=np.float64, sep=" ")
+    if values.size != size * len(block):
+        raise ValueError(f"expected {size} values per \"{prefix}\" line")
+    
+    return values.reshape(-1, size)
+
+def read_model_lines(lines: list[str]) -> np.ndarray:
+    """ 
+        Read the given obj file lines one at a time and
+        return all the vertex data as a flat float32 array.
+
+        The vertex data is gathered in a float32 array.array,
+        which numpy then wraps without copying.
     """
 
     v = []
     vt = []
     vn = []
-    vertices = []
+    vertices = array.array('f')
+    #corner description -> its vertex data, corners repeat across faces
+    corners = {}
 
-    with open(filename,'r') as f:
-        line = f.readline()
-        while line:
-            words = line.split(" ")
-            if words[0] == "v":
-                v.append(read_vertex_data(words))
-            elif words[0] == "vt":
-                vt.append(read_texcoord_data(words))
-            elif words[0] == "vn":
-                vn.append(read_normal_data(words))
-            elif words[0] == "f":
-                read_face_data(words, v, vt, vn, vertices)
-            line = f.readline()
+    for line in lines:
+        words = line.split(" ")
+        if words[0] == "v":
+            v.append(read_vertex_data(words))
+        elif words[0] == "vt":
+            vt.append(read_texcoord_data(words))
+        elif words[0] == "vn":
+            vn.append(read_normal_data(words))
+        elif words[0] == "f":
+            read_face_data(words, v, vt, vn, vertices, corners)
     
-    return vertices
+    return np.frombuffer(vertices, dtype=np.float32)
 
 def read_vertex_data(words: list[str]) -> list[float]:
     """ 
@@ -95,7 +325,7 @@ def read_normal_data(words: list[str]) -> list[float]:
 def read_face_data(
     words: list[str], 
     v: list[float], vt: list[float], vn: list[float], 
-    vertices: list[float]) -> None:
+    vertices: array.array, corners: dict[str, list[float]]) -> None:
     """
         Read the given face description, and use the
         data from the pre-filled v, vt, vn arrays to add
@@ -105,24 +335,30 @@ def read_face_data(
     triangles_in_face = len(words) - 3
 
     for i in range(triangles_in_face):
-        read_corner(words[1], v, vt, vn, vertices)
-        read_corner(words[i + 2], v, vt, vn, vertices)
-        read_corner(words[i + 3], v, vt, vn, vertices)
+        read_corner(words[1], v, vt, vn, vertices, corners)
+        read_corner(words[i + 2], v, vt, vn, vertices, corners)
+        read_corner(words[i + 3], v, vt, vn, vertices, corners)
 
 def read_corner(
     description: str, 
     v: list[float], vt: list[float], vn: list[float], 
-    vertices: list[float]) -> None:
+    vertices: array.array, corners: dict[str, list[float]]) -> None:
     """
         Read the given corner description, then send the
         approprate v, vt, vn data to the vertices array.
+
+        Each description's data is kept in corners,
+        so a repeated corner is only parsed once.
     """
 
-    v_vt_vn = description.split("/")
+    corner = corners.get(description)
+    if corner is None:
+        v_vt_vn = description.split("/")
+        corner = (
+            v[int(v_vt_vn[0]) - 1]
+            + vt[int(v_vt_vn[1]) - 1]
+            + vn[int(v_vt_vn[2]) - 1]
+        )
+        corners[description] = corner
 
-    for x in v[int(v_vt_vn[0]) - 1]:
-        vertices.append(x)
-    for x in vt[int(v_vt_vn[1]) - 1]:
-        vertices.append(x)
-    for x in vn[int(v_vt_vn[2]) - 1]:
-        vertices.append(x)
\ No newline at end of file
+    vertices.extend(corner)
@@ -0,0 +1,113 @@
+"""
+    Fixed size 4x4 transforms, written straight into caller owned
+    float32 arrays. Like the rest of the project these are laid out
+    for row vectors, so the translation sits in the bottom row.
+"""
+
+import math
+
+import numpy as np
+
+def build_rotations(eulers: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """
+        Build the (unscaled) rotation part of many model transforms in one pass.
+
+        Parameters:
+
+            eulers: (N,3) array of rotations (in degrees) around the x,y,z axes
+
+            out: optional (N,3,3) array to write the rotations into
+        
+        Returns:
+
+            An (N,3,3) array of rotations, laid out for row vectors,
+            float32 unless out is given
+    """
+
+    angles = np.radians(eulers, dtype=np.float64)
+    sx, sy, sz = np.sin(angles).T
+    cx, cy, cz = np.cos(angles).T
+
+    rotations = out
+    if rotations is None:
+        rotations = np.empty((len(eulers), 3, 3), dtype=np.float32)
+
+    rotations[:,0,0] = cy * cz
+    rotations[:,0,1] = -cy * sz
+    rotations[:,0,2] = sy
+
+    rotations[:,1,0] = cx * sz + sx * sy * cz
+    rotations[:,1,1] = cx * cz - sx * sy * sz
+    rotations[:,1,2] = -sx * cy
+
+    rotations[:,2,0] = sx * sz - cx * sy * cz
+    rotations[:,2,1] = sx * cz + cx * sy * sz
+    rotations[:,2,2] = cx * cy
+
+    return rotations
+
+def look_at(
+    out: np.ndarray, eye: np.ndarray, right: np.ndarray,
+    up: np.ndarray, forwards: np.ndarray) -> np.ndarray:
+    """
+        Write the view transform of a camera into out.
+
+        Parameters:
+
+            out: (4,4) float32 array to write into
+
+            eye: position of the camera
+
+            right, up, forwards: the camera's orthonormal basis
+
+        Returns:
+
+            out
+    """
+
+    rx, ry, rz = right.tolist()
+    ux, uy, uz = up.tolist()
+    fx, fy, fz = forwards.tolist()
+    x, y, z = eye.tolist()
+
+    out[0] = (rx, ux, -fx, 0)
+    out[1] = (ry, uy, -fy, 0)
+    out[2] = (rz, uz, -fz, 0)
+    out[3] = (
+        -(rx * x + ry * y + rz * z),
+        -(ux * x + uy * y + uz * z),
+        fx * x + fy * y + fz * z,
+        1
+    )
+
+    return out
+
+def perspective_projection(
+    out: np.ndarray, fovy: float, aspect: float,
+    near: float, far: float) -> np.ndarray:
+    """
+        Write a perspective projection into out.
+
+        Parameters:
+
+            out: (4,4) float32 array to write into
+
+            fovy: vertical field of view, in degrees
+
+            aspect: width / height of the screen
+
+            near, far: distances to the clipping planes
+
+        Returns:
+
+            out
+    """
+
+    f = 1 / math.tan(math.radians(fovy) / 2)
+
+    out[0] = (f / aspect, 0, 0, 0)
+    out[1] = (0, f, 0, 0)
+    out[2] = (0, 0, -(far + near) / (far - near), -1)
+    out[3] = (0, 0, -2 * far * near / (far - near), 0)
+
+    return out
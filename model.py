@@ -1,7 +1,12 @@
+import heapq
+import itertools
+import math
+from typing import Optional
+
 import numpy as np
-import pyrr
 import random
 from constants import *
+from math3d import *
 
 class Event:
 
@@ -9,6 +14,37 @@ class Event:
         self.type = type
         self.data = data
 
+def build_model_transforms(
+    positions: np.ndarray, rotations: np.ndarray,
+    scales: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """
+        Build the model transforms of many entities in one pass.
+
+        Parameters:
+
+            positions: (N,3) array of entity positions
+
+            rotations: (N,3,3) array of entity rotations, from build_rotations
+
+            scales: (N,3) array of entity scales along the x,y,z axes
+
+            out: optional (N,4,4) float32 array to write the transforms into
+        
+        Returns:
+
+            An (N,4,4) float32 array of model transforms
+    """
+
+    if out is None:
+        out = np.empty((len(positions), 4, 4), dtype=np.float32)
+
+    np.multiply(rotations, scales[:,:,None], out = out[:,0:3,0:3])
+    out[:,0:3,3] = 0
+    out[:,3,0:3] = positions
+    out[:,3,3] = 1
+
+    return out
+
 class Entity:
     """ Represents a general object with a position and rotation applied"""
 
@@ -32,49 +68,77 @@ class Entity:
 
         self.position = np.array(position, dtype=np.float32)
         self.eulers = np.array(eulers, dtype=np.float32)
+        self.scale = np.ones(3, dtype=np.float32)
         self.objectType = objectType
+
+        #unscaled rotation rows, and the eulers they were built from
+        self.rotation = None
+        self.rotationEulers = None
+
+        #the EntityStore holding this entity's state, once it's in a scene
+        self.store = None
+        self.row = None
+
+    def bind(self, store: "EntityStore", row: int) -> None:
+        """
+            Point the entity's position, eulers and scale at the
+            given row of the store's arrays.
+        """
+
+        self.store = store
+        self.row = row
+        self.position = store.positions[row]
+        self.eulers = store.eulers[row]
+        self.scale = store.scales[row]
     
-    def get_model_transform(self) -> np.ndarray:
+    def get_rotation(self) -> list[list[float]]:
         """
-            Calculates and returns the entity's transform matrix,
-            based on its position and rotation.
+            Returns the three rows of the entity's (unscaled) rotation,
+            recalculating them only if the eulers have changed.
         """
 
-        model_transform = pyrr.matrix44.create_identity(dtype=np.float32)
-        
-        model_transform = pyrr.matrix44.multiply(
-            m1=model_transform, 
-            m2=pyrr.matrix44.create_from_x_rotation(
-                theta = np.radians(self.eulers[0]), 
-                dtype=np.float32
-            )
-        )
+        eulers = self.eulers.tolist()
+        if eulers == self.rotationEulers:
+            return self.rotation
+        self.rotationEulers = eulers
 
-        model_transform = pyrr.matrix44.multiply(
-            m1=model_transform, 
-            m2=pyrr.matrix44.create_from_y_rotation(
-                theta = np.radians(self.eulers[1]), 
-                dtype=np.float32
-            )
-        )
+        #built in double precision, like the plain float maths using it
+        self.rotation = build_rotations(
+            self.eulers[None], out = np.empty((1,3,3)))[0].tolist()
 
-        model_transform = pyrr.matrix44.multiply(
-            m1=model_transform, 
-            m2=pyrr.matrix44.create_from_z_rotation(
-                theta = np.radians(self.eulers[2]), 
-                dtype=np.float32
-            )
-        )
+        return self.rotation
 
-        model_transform = pyrr.matrix44.multiply(
-            m1=model_transform,
-            m2=pyrr.matrix44.create_from_translation(
-                vec=self.position,
-                dtype=np.float32
-            )
-        )
+    def transform_point(self, x: float, y: float, z: float) -> list[float]:
+        """
+            Transform a point from the entity's model space into the world,
+            the same as multiplying (x,y,z,1) by the model transform.
+
+            Only the scale, rotation rows and position are touched,
+            so the 4x4 matrix is never built.
+
+            Returns:
+
+                The transformed (x,y,z) point as a list of plain floats
+        """
 
-        return model_transform
+        row0, row1, row2 = self.get_rotation()
+        scale_x, scale_y, scale_z = self.get_scale()
+        px, py, pz = self.position.tolist()
+
+        x *= scale_x
+        y *= scale_y
+        z *= scale_z
+
+        return [
+            x * row0[0] + y * row1[0] + z * row2[0] + px,
+            x * row0[1] + y * row1[1] + z * row2[1] + py,
+            x * row0[2] + y * row1[2] + z * row2[2] + pz
+        ]
+
+    def get_scale(self) -> list[float]:
+        """ Returns the entity's scale along its x, y, z axes. """
+
+        return self.scale.tolist()
 
     def update(self, rate: float) -> Event:
 
@@ -100,33 +164,19 @@ class Leaf(Entity):
     def __init__(self, position: list[float], eulers: list[float], branch):
         super().__init__(position, eulers, OBJECT_LEAF)
         self.branch = branch
-        self.age = 1
-        self.dying = False
 
     def fall_off(self):
-        self.dying = True
-
-    def update(self, rate):
-        if not self.dying:
-            self.age += 1
-        else:
-            self.age -= 1
-            if self.age == 0:
-                return Event(EVENT_DEL, self)
-
-    def get_model_transform(self):
-        # TODO leaf growing
-        scale_factor = min(0.2, self.age / 1000)
-        scale_transform = pyrr.matrix44.create_from_scale([scale_factor, scale_factor, scale_factor])
-        return scale_transform @ super().get_model_transform() 
+        self.store.rates[self.row] = -1
         
 class Branch(Entity):
 
-    def __init__(self, position: list[float], eulers: list[float], parent=None, radius=1, height=1):
+    def __init__(self, position: list[float], eulers: list[float], parent=None, radius=1, height=1, radiusFactor=1):
         super().__init__(position, eulers, OBJECT_BRANCH)
 
         self.radius = radius
         self.height = height
+        # Fraction of the tree's root radius this branch is kept at
+        self.radiusFactor = radiusFactor
         self.parent = parent
         self.above = None
         self.split = None
@@ -135,23 +185,31 @@ class Branch(Entity):
         self.age = 0
         self.depth = self.parent.depth + 1 if self.parent else 1
 
+    @property
+    def radius(self) -> float:
+        return float(self.scale[0])
+
+    @radius.setter
+    def radius(self, radius: float) -> None:
+        self.scale[0] = radius
+        self.scale[1] = radius
+
+    @property
+    def height(self) -> float:
+        return float(self.scale[2])
+
+    @height.setter
+    def height(self, height: float) -> None:
+        self.scale[2] = height
+
     def calculate_leaf_pos(self):
         theta = 360 * random.randint(0, 19) / 20 # Random angle on the branch to place the leaf
         
-        base = np.array([
-            BRANCH_TOP_RADIUS * np.sin(np.radians(theta)), 
-            BRANCH_TOP_RADIUS * np.cos(np.radians(theta)), 
-            BRANCH_HEIGHT,
-            1
-        ]).reshape(1, 4)
-
-
-        new_base = base @ self.get_model_transform()
-        branch_space_position = [
-            new_base[0,0],
-            new_base[0,1],
-            new_base[0,2]
-        ]
+        branch_space_position = self.transform_point(
+            BRANCH_TOP_RADIUS * math.sin(math.radians(theta)), 
+            BRANCH_TOP_RADIUS * math.cos(math.radians(theta)), 
+            BRANCH_HEIGHT
+        )
 
         eulers = [
             self.eulers[0],
@@ -162,20 +220,7 @@ class Branch(Entity):
         return branch_space_position, eulers
     
     def calculate_extend_pos(self):
-        center_top = np.array([
-            0,
-            0,
-            BRANCH_HEIGHT,
-            1
-        ]).reshape(1, 4)
-
-
-        new_base = center_top @ self.get_model_transform()
-        branch_space_position = [
-            new_base[0,0],
-            new_base[0,1],
-            new_base[0,2]
-        ]
+        branch_space_position = self.transform_point(0, 0, BRANCH_HEIGHT)
 
         eulers = [
             self.eulers[0],
@@ -186,20 +231,11 @@ class Branch(Entity):
         return branch_space_position, eulers
     
     def calculate_split_pos(self):
-        split_pos = np.array([
+        branch_space_position = self.transform_point(
             0,
             BRANCH_SPLIT_Y * self.radius,
-            BRANCH_SPLIT_Z * self.height,
-            1
-        ]).reshape(1, 4)
-
-
-        new_base = split_pos @ self.get_model_transform()
-        branch_space_position = [
-            new_base[0,0],
-            new_base[0,1],
-            new_base[0,2]
-        ]
+            BRANCH_SPLIT_Z * self.height
+        )
         rotation = random.randint(0, 20) * 18
         eulers = [
             self.eulers[0] + BRANCH_SPLIT_X_ROTATION,
@@ -215,11 +251,17 @@ class Branch(Entity):
 
     def grow_branch(self):
         vertex_pos, eulers = self.calculate_extend_pos()
-        self.above = Branch(vertex_pos, eulers, parent=self, radius = 0, height=0)
+        self.above = Branch(
+            vertex_pos, eulers, parent=self, radius = 0, height=0,
+            radiusFactor = self.radiusFactor * BRANCH_TOP_RADIUS
+        )
 
     def split_branch(self):
         vertex_pos, eulers = self.calculate_split_pos()
-        self.split = Branch(vertex_pos, eulers, parent=self, radius=0, height=0)
+        self.split = Branch(
+            vertex_pos, eulers, parent=self, radius=0, height=0,
+            radiusFactor = self.radiusFactor * BRANCH_SPLIT_RADIUS
+        )
 
     def attempt_split(self):
         if self.split == None:
@@ -235,9 +277,7 @@ class Branch(Entity):
         
 
     def attempt_extend(self):
-        if self.height < 1:
-            self.height += 0.001
-        elif self.above == None and self.radius > MIN_EXTEND_RADIUS and self.depth < MAX_DEPTH:
+        if self.height >= 1 and self.above == None and self.radius > MIN_EXTEND_RADIUS and self.depth < MAX_DEPTH:
             self.height = 1
             self.grow_branch()
             return True
@@ -250,20 +290,60 @@ class Branch(Entity):
             return True
         return False
 
-    def attempt_grow_wider(self):
-        if self.parent == None:
-            # base of tree
-            self.radius += 0.00001
+    def attempt_drop_leaf(self):
+        # Radius and height growth is done for all branches at once by BranchStore
         if self.radius > LEAF_GROWING_MAX_RADIUS and len(self.leaves) != 0:
             self.leaves.pop().fall_off()
-        if self.split != None and self.split != -1:
-            self.split.radius = self.radius * BRANCH_SPLIT_RADIUS
-        if self.above != None:
-            self.above.radius = self.radius * BRANCH_TOP_RADIUS
 
     
+    def frames_until(self, radius: float, radiusRate: float) -> Optional[int]:
+        """
+            Returns a number of frames, at most as many as it takes for
+            the branch to grow wider than the given radius, or None if
+            it isn't growing. Rounded down so the branch is never late.
+        """
+
+        if radiusRate <= 0:
+            return None
+        return max(1, int((radius - self.radius) / radiusRate) - 2)
+
+    def get_update_delay(self, radiusRate: float) -> Optional[int]:
+        """
+            Returns how many frames can pass before update might do
+            something again, or None if it never will.
+
+            Parameters:
+
+                radiusRate: how much the branch's radius grows each frame
+        """
+
+        #splitting rolls the dice every frame until it has been decided
+        if self.split == None or (self.split == -1 and self.depth > MAX_DEPTH * 0.75):
+            return 1
+
+        delays = []
+
+        #leaves drop one per frame once the branch is wide enough
+        if self.leaves:
+            if self.radius > LEAF_GROWING_MAX_RADIUS:
+                return 1
+            delays.append(self.frames_until(LEAF_GROWING_MAX_RADIUS, radiusRate))
+
+        if self.above == None:
+            if self.depth < MAX_DEPTH:
+                delay = max(1, int((1 - self.height) / BRANCH_GROWTH_RATE) - 2)
+                if self.radius <= MIN_EXTEND_RADIUS:
+                    radius_delay = self.frames_until(MIN_EXTEND_RADIUS, radiusRate)
+                    delay = None if radius_delay is None else max(delay, radius_delay)
+                delays.append(delay)
+        elif self.radius < LEAF_GROWING_MAX_RADIUS and len(self.leaves) < (1 / self.radius):
+            return 1
+
+        delays = [delay for delay in delays if delay is not None]
+        return min(delays) if delays else None
+
     def update(self, rate):
-        self.attempt_grow_wider()
+        self.attempt_drop_leaf()
 
         if self.attempt_extend():
             return Event(EVENT_NEW, self.above)
@@ -276,9 +356,6 @@ class Branch(Entity):
             return Event(EVENT_NEW, self.leaves[-1])
 
         
-    def get_model_transform(self):
-        return pyrr.matrix44.create_from_scale([self.radius, self.radius, self.height]) @ super().get_model_transform()
-        
 class Player(Entity):
     """ A first person camera controller. """
 
@@ -293,6 +370,9 @@ class Player(Entity):
         self.up = np.array([0,0,1], dtype=np.float32)
         self.right = np.array([0,1,0], dtype=np.float32)
         self.forwards = np.array([1,0,0], dtype=np.float32)
+
+        #eulers the vectors were last calculated from
+        self.lastEulers = None
     
     def calculate_vectors(self) -> None:
         """ 
@@ -300,36 +380,306 @@ class Player(Entity):
 
             There are various ways to do this, this function
             achieves it by using cross products to produce
-            an orthonormal basis.
+            an orthonormal basis. Nothing is recalculated if
+            the camera hasn't rotated since the last call.
         """
 
+        eulers = self.eulers.tolist()
+        if eulers == self.lastEulers:
+            return
+        self.lastEulers = eulers
+
         #calculate the forwards vector directly using spherical coordinates
-        self.forwards = np.array(
-            [
-                np.cos(np.radians(self.eulers[2])) * np.cos(np.radians(self.eulers[1])),
-                np.sin(np.radians(self.eulers[2])) * np.cos(np.radians(self.eulers[1])),
-                np.sin(np.radians(self.eulers[1]))
-            ],
-            dtype=np.float32
-        )
-        self.right = pyrr.vector.normalise(np.cross(self.forwards, self.localUp))
-        self.up = pyrr.vector.normalise(np.cross(self.right, self.forwards))
+        theta = math.radians(eulers[2])
+        phi = math.radians(eulers[1])
+        fx = math.cos(theta) * math.cos(phi)
+        fy = math.sin(theta) * math.cos(phi)
+        fz = math.sin(phi)
+        self.forwards[:] = (fx, fy, fz)
+
+        #right = forwards x localUp
+        ux, uy, uz = self.localUp.tolist()
+        rx = fy * uz - fz * uy
+        ry = fz * ux - fx * uz
+        rz = fx * uy - fy * ux
+        length = math.sqrt(rx * rx + ry * ry + rz * rz)
+        rx, ry, rz = rx / length, ry / length, rz / length
+        self.right[:] = (rx, ry, rz)
+
+        #up = right x forwards
+        ux = ry * fz - rz * fy
+        uy = rz * fx - rx * fz
+        uz = rx * fy - ry * fx
+        length = math.sqrt(ux * ux + uy * uy + uz * uz)
+        self.up[:] = (ux / length, uy / length, uz / length)
 
     def update(self) -> None:
         """ Updates the camera """
 
         self.calculate_vectors()
 
-    def get_view_transform(self) -> np.ndarray:
-        """ Return's the camera's view transform. """
+    def get_view_transform(self, out: np.ndarray) -> np.ndarray:
+        """
+            Write the camera's view transform into out and return it.
+
+            This is the look at transform, written straight from the
+            orthonormal basis calculate_vectors has already built.
+
+            Parameters:
+
+                out: (4,4) float32 array to write into,
+                    eg. the view slot of the camera's uniform block
+        """
+
+        return look_at(
+            out, self.position,
+            self.right, self.up, self.forwards
+        )
+
+class EntityStore:
+    """
+        Holds all the entities of one type. The state which changes
+        every frame is kept in contiguous arrays, one row per entity,
+        so that it can be updated for every entity at once.
+    """
+
 
-        return pyrr.matrix44.create_look_at(
-            eye = self.position,
-            target = self.position + self.forwards,
-            up = self.up,
-            dtype = np.float32
+    def __init__(self, capacity: int = 64):
+        """
+            Create an empty store.
+
+            Parameters:
+
+                capacity: number of rows to allocate up front,
+                            this doubles whenever the store fills up.
+        """
+
+        self.entities: list[Entity] = []
+
+        #names of the per-row arrays, subclasses add their own
+        self.columns = [
+            "positions", "eulers", "scales", "rotations", "rotationEulers"
+        ]
+        self.positions = np.zeros((capacity, 3), dtype=np.float32)
+        self.eulers = np.zeros((capacity, 3), dtype=np.float32)
+        self.scales = np.ones((capacity, 3), dtype=np.float32)
+
+        #entities hardly ever rotate, so each row's rotation is kept along
+        #with the eulers it was built from and only rebuilt when they change
+        self.rotations = np.zeros((capacity, 3, 3), dtype=np.float32)
+        self.rotationEulers = np.zeros((capacity, 3), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def __iter__(self):
+        return iter(self.entities)
+
+    def make_room(self) -> None:
+        """ Double the capacity of every array, keeping their contents. """
+
+        for name in self.columns:
+            old = getattr(self, name)
+            new = np.zeros((2 * len(old),) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+        for row, entity in enumerate(self.entities):
+            entity.bind(self, row)
+
+    def add(self, entity: Entity) -> int:
+        """
+            Copy the entity's state into the next free row,
+            then point the entity at it. Returns the row.
+        """
+
+        row = len(self.entities)
+        if row == len(self.positions):
+            self.make_room()
+
+        self.positions[row] = entity.position
+        self.eulers[row] = entity.eulers
+        self.scales[row] = entity.scale
+        self.rotationEulers[row] = np.nan
+        entity.bind(self, row)
+        self.entities.append(entity)
+
+        return row
+
+    def remove(self, entities: list[Entity]) -> None:
+        """
+            Remove the given entities, each one's row is filled
+            by moving the last entity in the store into it.
+        """
+
+        for entity in entities:
+            row = entity.row
+            last = self.entities.pop()
+
+            if last is not entity:
+                for name in self.columns:
+                    array = getattr(self, name)
+                    array[row] = array[len(self.entities)]
+                self.entities[row] = last
+                last.bind(self, row)
+
+            entity.store = None
+            entity.row = None
+
+    def get_model_transforms(self, out: np.ndarray = None) -> np.ndarray:
+        """
+            Returns the (N,4,4) model transforms of every entity in the store,
+            written into out if it's given.
+        """
+
+        count = len(self.entities)
+        eulers = self.eulers[:count]
+
+        stale = np.flatnonzero((eulers != self.rotationEulers[:count]).any(axis = 1))
+        if len(stale):
+            self.rotations[stale] = build_rotations(eulers[stale])
+            self.rotationEulers[stale] = eulers[stale]
+
+        return build_model_transforms(
+            self.positions[:count], self.rotations[:count], self.scales[:count],
+            out
         )
 
+    def update(self, rate: float) -> list[Event]:
+        """
+            Update every entity in the store, returning
+            any events they produce.
+        """
+
+        events = []
+        for entity in self.entities:
+            event = entity.update(rate)
+            if event:
+                events.append(event)
+
+        return events
+
+class BranchStore(EntityStore):
+    """
+        Holds the branches of a tree. The tree's root widens
+        a little every frame and every other branch is kept
+        at a fixed fraction of the root's radius.
+    """
+
+
+    def __init__(self, capacity: int = 64):
+
+        super().__init__(capacity)
+
+        self.columns.append("radiusFactors")
+        self.radiusFactors = np.zeros(capacity, dtype=np.float32)
+        self.rootRadius = 0
+
+        #branches only get updated on the frames they might do something,
+        #this heap holds (frame, tiebreak, branch) for the next one of each
+        self.frame = 0
+        self.schedule = []
+        self.scheduleOrder = itertools.count()
+    
+    def add(self, branch: Branch) -> int:
+
+        row = super().add(branch)
+        self.radiusFactors[row] = branch.radiusFactor
+        if branch.parent == None:
+            self.rootRadius = branch.radius
+        self.schedule_update(branch, 1)
+
+        return row
+
+    def schedule_update(self, branch: Branch, delay: int) -> None:
+        """ Update the branch again after the given number of frames. """
+
+        heapq.heappush(
+            self.schedule,
+            (self.frame + delay, next(self.scheduleOrder), branch)
+        )
+
+    def update(self, rate: float) -> list[Event]:
+        """
+            Grow all branches at once, then let each branch
+            which is due this frame act.
+        """
+
+        count = len(self.entities)
+        scales = self.scales[:count]
+
+        self.rootRadius += ROOT_GROWTH_RATE
+        radii = self.rootRadius * self.radiusFactors[:count]
+        scales[:,0] = radii
+        scales[:,1] = radii
+
+        heights = scales[:,2]
+        heights[heights < 1] += BRANCH_GROWTH_RATE
+
+        self.frame += 1
+        due = []
+        while self.schedule and self.schedule[0][0] <= self.frame:
+            branch = heapq.heappop(self.schedule)[2]
+            if branch.store is self:
+                due.append(branch)
+        #same order as updating every branch would give
+        due.sort(key = lambda branch: branch.row)
+
+        events = []
+        for branch in due:
+            event = branch.update(rate)
+            if event:
+                events.append(event)
+
+            delay = branch.get_update_delay(ROOT_GROWTH_RATE * branch.radiusFactor)
+            if delay is not None:
+                self.schedule_update(branch, delay)
+
+        return events
+
+class LeafStore(EntityStore):
+    """
+        Holds leaves. Leaves age by one every frame, until they
+        fall off their branch, then shrink back down and disappear.
+    """
+
+
+    def __init__(self, capacity: int = 64):
+
+        super().__init__(capacity)
+
+        self.columns += ["ages", "rates"]
+        self.ages = np.zeros(capacity, dtype=np.int32)
+        #+1 while a leaf is growing, -1 once it's falling off
+        self.rates = np.zeros(capacity, dtype=np.int32)
+
+    def add(self, leaf: Leaf) -> int:
+
+        row = super().add(leaf)
+        self.ages[row] = 1
+        self.rates[row] = 1
+        self.scales[row] = self.get_scales(self.ages[row])
+
+        return row
+
+    def get_scales(self, ages: np.ndarray) -> np.ndarray:
+        """ Returns the scale of leaves of the given ages. """
+
+        return np.minimum(0.2, ages / 1000)
+
+    def update(self, rate: float) -> list[Event]:
+        """ Age every leaf at once, returning an event for each dead leaf. """
+
+        count = len(self.entities)
+        ages = self.ages[:count]
+        ages += self.rates[:count]
+        self.scales[:count] = self.get_scales(ages)[:,None]
+
+        return [
+            Event(EVENT_DEL, self.entities[row])
+            for row in np.flatnonzero(ages == 0)
+        ]
+
 class Scene:
     """ 
         Manages all logical objects in the game,
@@ -340,14 +690,14 @@ class Scene:
     def __init__(self):
         """ Create a scene """
 
-        self.renderables: dict[int,list[Entity]] = {}
-        self.renderables[OBJECT_BRANCH] = [
+        self.renderables: dict[int,EntityStore] = {}
+        self.add_entity(
             Branch(
                 position=[0,0,0],
                 eulers=[0,0,0],
                 radius = 0.1
             )
-        ]
+        )
 
         self.camera = Player(
             position = [-10,0,4],
@@ -363,26 +713,40 @@ class Scene:
                 rate: framerate correction factor
         """
         events = []
-        for _,objectList in self.renderables.items():
-            for object in objectList:
-                event = object.update(rate)
-                if event:
-                    events.append(event)
+        for store in self.renderables.values():
+            events += store.update(rate)
 
+        removed: dict[int,list[Entity]] = {}
         for event in events:
             if event.type == EVENT_NEW:
-                entity = event.data
-                
-                if entity.objectType in self.renderables:
-                    self.renderables[entity.objectType].append(entity)
-                else:
-                    self.renderables[entity.objectType] = [entity]
+                self.add_entity(event.data)
             if event.type == EVENT_DEL:
                 entity = event.data
-                self.renderables[entity.objectType].remove(entity)
+                removed.setdefault(entity.objectType, []).append(entity)
+
+        for objectType, entities in removed.items():
+            self.renderables[objectType].remove(entities)
         
         self.camera.update()
 
+    def get_model_transforms(self, objectType: int) -> np.ndarray:
+        """ Returns the (N,4,4) model transforms of every entity of the given type. """
+
+        return self.renderables[objectType].get_model_transforms()
+
+    def add_entity(self, entity: Entity) -> None:
+        """ Add the entity to the store for its type, making one if needed. """
+
+        if entity.objectType not in self.renderables:
+            if entity.objectType == OBJECT_BRANCH:
+                self.renderables[entity.objectType] = BranchStore()
+            elif entity.objectType == OBJECT_LEAF:
+                self.renderables[entity.objectType] = LeafStore()
+            else:
+                self.renderables[entity.objectType] = EntityStore()
+
+        self.renderables[entity.objectType].add(entity)
+
     def move_camera(self, dPos: np.ndarray) -> None:
         """ Moves the camera by the given amount """
 
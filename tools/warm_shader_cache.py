@@ -0,0 +1,94 @@
+"""
+    Compile every shader pipeline once and write the program binaries
+    to cache/shaders, which the app checks before the user's cache,
+    so the first run on this driver doesn't have to compile them.
+
+    Binaries are keyed by the driver's vendor, renderer and version,
+    a machine with a different driver just rebuilds them on first run.
+
+    Usage:
+
+        python tools/warm_shader_cache.py [cache directory]
+
+    The cache directory defaults to the bundled cache/shaders.
+"""
+
+import os
+import sys
+
+import glfw
+import glfw.GLFW as GLFW_CONSTANTS
+from OpenGL.GL import GL_FRAGMENT_SHADER, GL_VERTEX_SHADER, glDeleteProgram
+from OpenGL.GL.shaders import compileProgram, compileShader
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import helper
+from constants import *
+
+def make_hidden_context() -> None:
+    """ Make an invisible window with the same context the app asks for. """
+
+    if not glfw.init():
+        raise RuntimeError("Couldn't initialize glfw")
+    glfw.window_hint(GLFW_CONSTANTS.GLFW_VISIBLE, False)
+    glfw.window_hint(GLFW_CONSTANTS.GLFW_CONTEXT_VERSION_MAJOR,3)
+    glfw.window_hint(GLFW_CONSTANTS.GLFW_CONTEXT_VERSION_MINOR,3)
+    glfw.window_hint(
+        GLFW_CONSTANTS.GLFW_OPENGL_PROFILE,
+        GLFW_CONSTANTS.GLFW_OPENGL_CORE_PROFILE
+    )
+    glfw.window_hint(
+        GLFW_CONSTANTS.GLFW_OPENGL_FORWARD_COMPAT,
+        GLFW_CONSTANTS.GLFW_TRUE
+    )
+    window = glfw.create_window(1, 1, "Shader cache", None, None)
+    if not window:
+        raise RuntimeError("Couldn't create an OpenGL 3.3 context")
+    glfw.make_context_current(window)
+
+def warm(vertexFilepath: str, fragmentFilepath: str, directory: str) -> str:
+    """
+        Build the given pipeline and write its binary into directory,
+        returning the path of the binary.
+    """
+
+    with open(vertexFilepath, 'rb') as f:
+        vertex_src = f.read()
+
+    with open(fragmentFilepath, 'rb') as f:
+        fragment_src = f.read()
+
+    shader = compileProgram(compileShader(vertex_src, GL_VERTEX_SHADER),
+                            compileShader(fragment_src, GL_FRAGMENT_SHADER),
+                            validate = False,
+                            retrievable = True
+                        )
+    cache_path = helper.get_shader_cache_path(vertex_src, fragment_src, directory)
+    helper.save_cached_shader(shader, cache_path)
+    glDeleteProgram(shader)
+
+    return cache_path
+
+def main() -> None:
+
+    directory = helper.BUNDLED_SHADER_CACHE_DIR
+    if len(sys.argv) > 1:
+        directory = os.path.abspath(sys.argv[1])
+
+    #shader paths are relative to the project root
+    os.chdir(ROOT)
+    make_hidden_context()
+
+    if not helper.shader_binaries_supported():
+        print("This driver doesn't support program binaries, nothing to cache")
+    else:
+        for vertexFilepath, fragmentFilepath in SHADER_SOURCES.values():
+            cache_path = warm(vertexFilepath, fragmentFilepath, directory)
+            print(f"{vertexFilepath} + {fragmentFilepath} -> {cache_path}")
+
+    glfw.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import glfw
 from PIL import Image, ImageOps
 
@@ -15,11 +17,14 @@ class Renderer:
 
         self.screenWidth = screenWidth
         self.screenHeight = screenHeight
+        self.window = window
 
         self.set_up_opengl(window)
         
         self.make_assets()
 
+        self.set_up_camera_buffer()
+
         self.set_onetime_uniforms()
 
         self.get_uniform_locations()
@@ -40,52 +45,93 @@ class Renderer:
         glEnable(GL_BLEND)
         glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
+        #meshes are wound counter clockwise when seen from outside
+        glEnable(GL_CULL_FACE)
+        glCullFace(GL_BACK)
+        glFrontFace(GL_CCW)
+
     def make_assets(self) -> None:
         """
             Load/Create assets (eg. meshes and materials) that 
             the renderer will use.
         """
 
+        #every mesh's vertices live in this one buffer
+        self.vertexPool = BufferPool(VERTEX_POOL_SIZE)
         self.meshes: dict[int, Mesh] = {
-            OBJECT_LEAF: InstancedObjMesh("models/leaf.obj"),
-            OBJECT_BRANCH: InstancedObjMesh("models/branch.obj"),
-            OBJECT_CUBE: ObjMesh("models/cube.obj"),
+            OBJECT_LEAF: InstancedObjMesh("models/leaf.obj", self.vertexPool),
+            OBJECT_BRANCH: InstancedObjMesh("models/branch.obj", self.vertexPool),
+            OBJECT_CUBE: ObjMesh("models/cube.obj", self.vertexPool),
             OBJECT_SKY: Quad2D(
                 center = (0,0),
-                size = (1,1)
+                size = (1,1),
+                pool = self.vertexPool
             )
         }
 
+        #open meshes which can be seen from either side
+        self.doubleSidedTypes = {OBJECT_LEAF}
+
+        #the object textures are layers of one texture array
+        textures = MaterialArray(["gfx/leaf.jpeg", "gfx/wood.jpeg"])
         self.materials: dict[int, Material] = {
-            OBJECT_LEAF: Material2D("gfx/leaf.jpeg"),
-            OBJECT_BRANCH: Material2D("gfx/wood.jpeg"),
-            OBJECT_CUBE: Material2D("gfx/wood.jpeg"),
+            OBJECT_LEAF: textures,
+            OBJECT_BRANCH: textures,
+            OBJECT_CUBE: textures,
             OBJECT_SKY: MaterialCubemap("gfx/sky")
         }
+        self.materialLayers: dict[int, int] = {
+            OBJECT_LEAF: textures.layers["gfx/leaf.jpeg"],
+            OBJECT_BRANCH: textures.layers["gfx/wood.jpeg"],
+            OBJECT_CUBE: textures.layers["gfx/wood.jpeg"]
+        }
 
         self.shaders: dict[int, int] = {
-            PIPELINE_SKY: createShader(
-                "shaders/vertex_sky.txt", 
-                "shaders/fragment_sky.txt"
-            ),
-            PIPELINE_3D: createShader(
-                "shaders/vertex.txt", 
-                "shaders/fragment.txt"
-            )
+            pipeline: createShader(vertexFilepath, fragmentFilepath)
+            for pipeline, (vertexFilepath, fragmentFilepath)
+            in SHADER_SOURCES.items()
         }
 
+    def set_up_camera_buffer(self) -> None:
+        """
+            Make the uniform buffer holding the camera's data, which
+            every shader reads through its CameraBlock. The layout is
+            std140:
+
+                0: projection (mat4), 64: view (mat4),
+                128: viewerPos, 144: camera_forwards,
+                160: camera_right, 176: camera_up (vec3s padded to 16 bytes)
+        """
+
+        self.cameraData = np.zeros(48, dtype=np.float32)
+        perspective_projection(
+            self.cameraData[0:16].reshape(4,4),
+            fovy = 45, aspect = self.screenWidth / self.screenHeight, 
+            near = 0.1, far = 50
+        )
+
+        #the view transform is written straight into its slot
+        self.cameraView = self.cameraData[16:32].reshape(4,4)
+
+        #raw address of the per frame part, PyOpenGL passes it straight
+        #through instead of checking the array's shape and type every call
+        self.cameraDataPointer = ctypes.c_void_p(self.cameraData.ctypes.data + 64)
+
+        self.cameraBuffer = glGenBuffers(1)
+        glBindBuffer(GL_UNIFORM_BUFFER, self.cameraBuffer)
+        glBufferData(GL_UNIFORM_BUFFER, self.cameraData.nbytes, self.cameraData, GL_STREAM_DRAW)
+        glBindBufferBase(GL_UNIFORM_BUFFER, CAMERA_BLOCK_BINDING, self.cameraBuffer)
+
+        for shader in self.shaders.values():
+            glUniformBlockBinding(
+                shader, glGetUniformBlockIndex(shader, "CameraBlock"),
+                CAMERA_BLOCK_BINDING
+            )
+
     def set_onetime_uniforms(self) -> None:
         """ Set any uniforms which can simply get set once and forgotten """
         
         glUseProgram(self.shaders[PIPELINE_3D])
-        projection_transform = pyrr.matrix44.create_perspective_projection(
-            fovy = 45, aspect = self.screenWidth / self.screenHeight, 
-            near = 0.1, far = 50, dtype = np.float32
-        )
-        glUniformMatrix4fv(
-            glGetUniformLocation(self.shaders[PIPELINE_3D], "projection"), 
-            1, GL_FALSE, projection_transform
-        )
         glUniform1i(
             glGetUniformLocation(self.shaders[PIPELINE_3D], "imageTexture"), 1)
         glUniform1i(
@@ -94,32 +140,33 @@ class Renderer:
         glUseProgram(self.shaders[PIPELINE_SKY])
         glUniform1i(
             glGetUniformLocation(self.shaders[PIPELINE_SKY], "imageTexture"), 0)
-    
+
     def get_uniform_locations(self) -> None:
         """ 
             Query and store the locations of any uniforms 
             on the shader 
         """
 
-        glUseProgram(self.shaders[PIPELINE_SKY])
-        self.cameraForwardsLocation = glGetUniformLocation(
-            self.shaders[PIPELINE_SKY], "camera_forwards")
-        self.cameraRightLocation = glGetUniformLocation(
-            self.shaders[PIPELINE_SKY], "camera_right")
-        self.cameraUpLocation = glGetUniformLocation(
-            self.shaders[PIPELINE_SKY], "camera_up")
-
-        glUseProgram(self.shaders[PIPELINE_3D])
-        self.modelMatrixLocation = glGetUniformLocation(
-            self.shaders[PIPELINE_3D], "model")
-        self.viewMatrixLocation = glGetUniformLocation(
-            self.shaders[PIPELINE_3D], "view")
-        self.cameraPosLocation = glGetUniformLocation(
-            self.shaders[PIPELINE_3D], "viewerPos")
+        self.layerLocation = glGetUniformLocation(
+            self.shaders[PIPELINE_3D], "layer")
     
+    def send_camera_data(self, camera: Player) -> None:
+        """ Upload everything in the camera's uniform block except the projection. """
+
+        camera_data = self.cameraData
+        camera.get_view_transform(out = self.cameraView)
+        camera_data[32:35] = camera.position
+        camera_data[36:39] = camera.forwards
+        camera_data[40:43] = camera.right
+        camera_data[44:47] = camera.up
+        camera_data[44:47] *= self.screenHeight / self.screenWidth
+
+        glBindBuffer(GL_UNIFORM_BUFFER, self.cameraBuffer)
+        glBufferSubData(GL_UNIFORM_BUFFER, 64, 128, self.cameraDataPointer)
+
     def render(
         self, camera: Player, 
-        renderables: dict[int, list[Entity]]) -> None:
+        renderables: dict[int, EntityStore]) -> None:
         """
             Render a frame.
 
@@ -128,164 +175,329 @@ class Renderer:
                 camera: the camera to render from
 
                 renderables: a dictionary of entities to draw, keys are the
-                            entity types, for each of these there is a list
-                            of entities.
+                            entity types, for each of these there is a store
+                            holding the entities.
         """
 
         #refresh screen
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
+        self.send_camera_data(camera)
+
         #draw sky
         glUseProgram(self.shaders[PIPELINE_SKY])
         glDisable(GL_DEPTH_TEST)
         self.materials[OBJECT_SKY].use()
-        glUniform3fv(
-            self.cameraForwardsLocation, 1, camera.forwards)
-        glUniform3fv(
-            self.cameraRightLocation, 1, camera.right)
-        glUniform3fv(
-            self.cameraUpLocation, 1, 
-            (self.screenHeight / self.screenWidth) * camera.up)
         glBindVertexArray(self.meshes[OBJECT_SKY].vao)
         glDrawArrays(
-            GL_TRIANGLES, 
+            GL_TRIANGLE_STRIP, 
             0, self.meshes[OBJECT_SKY].vertex_count)
         
         #Everything else
         glUseProgram(self.shaders[PIPELINE_3D])
         glEnable(GL_DEPTH_TEST)
 
-        glUniformMatrix4fv(
-            self.viewMatrixLocation, 
-            1, GL_FALSE, camera.get_view_transform()
-        )
-        glUniform3fv(self.cameraPosLocation, 1, camera.position)
-        self.materials[OBJECT_SKY].use()
-
-        for objectType,objectList in renderables.items():
+        #types share the texture array, only bind a material when it changes
+        last_material = None
+        for objectType,store in renderables.items():
+            #leaves can all die off, leaving an empty store
+            if not store:
+                continue
             mesh = self.meshes[objectType]
             material = self.materials[objectType]
-            glBindVertexArray(mesh.vao)
-            material.use()
-            transforms = []
-            for object in objectList:
-                transforms.append(object.get_model_transform())
-            mesh.send_instance_data(np.array(transforms, dtype=np.float32))
+            if material is not last_material:
+                material.use()
+                last_material = material
+            glUniform1i(self.layerLocation, self.materialLayers[objectType])
+            instance_count = len(store)
+            store.get_model_transforms(mesh.reserve_instances(instance_count))
+            #this leaves the mesh's vao bound
+            mesh.send_instance_data(instance_count)
            
-            glBindVertexArray(mesh.vao)
-            glDrawArraysInstanced(GL_TRIANGLES, 0, mesh.vertex_count, len(transforms))
+            double_sided = objectType in self.doubleSidedTypes
+            if double_sided:
+                glDisable(GL_CULL_FACE)
+            glDrawArraysInstanced(GL_TRIANGLES, 0, mesh.vertex_count, instance_count)
+            if double_sided:
+                glEnable(GL_CULL_FACE)
 
-        glFlush()
+        glfw.swap_buffers(self.window)
 
     def destroy(self) -> None:
         """ Free any allocated memory """
 
         for (_,mesh) in self.meshes.items():
             mesh.destroy()
-        for (_,material) in self.materials.items():
+        self.vertexPool.destroy()
+        for material in set(self.materials.values()):
             material.destroy()
         for (_, shader) in self.shaders.items():
             glDeleteProgram(shader)
+        glDeleteBuffers(1, (self.cameraBuffer,))
+
+class BufferPool:
+    """
+        One large vertex buffer, meshes are handed space
+        in it rather than each having their own buffer.
+    """
+
+
+    def __init__(self, size: int):
+        """
+            Allocate the pool.
+
+            Parameters:
+
+                size: size of the buffer, in bytes
+        """
+
+        self.size = size
+        self.used = 0
+
+        self.buffer = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        glBufferData(GL_ARRAY_BUFFER, size, None, GL_STATIC_DRAW)
+
+    def allocate(self, nbytes: int) -> int:
+        """
+            Reserve the given number of bytes,
+            returning their offset into the buffer.
+        """
+
+        #keep every allocation 16 byte aligned
+        offset = (self.used + 15) & ~15
+        if offset + nbytes > self.size:
+            raise MemoryError(
+                f"vertex pool is full, {nbytes} bytes don't fit in {self.size - offset}"
+            )
+        self.used = offset + nbytes
+
+        return offset
+
+    def destroy(self):
+
+        glDeleteBuffers(1, (self.buffer,))
 
 class Mesh:
     """ A general mesh """
 
 
-    def __init__(self):
+    def __init__(self, pool: BufferPool):
 
         self.vertex_count = 0
 
         self.vao = glGenVertexArrays(1)
-        self.vbo = glGenBuffers(1)
+        self.pool = pool
+        self.vbo = pool.buffer
+        self.vbo_offset = 0
+
+    def upload(self, vertices: np.ndarray) -> None:
+        """ Copy the mesh's vertices into space from the pool. """
+
+        self.vbo_offset = self.pool.allocate(vertices.nbytes)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferSubData(GL_ARRAY_BUFFER, self.vbo_offset, vertices.nbytes, vertices)
     
     def destroy(self):
         
+        #the vertex buffer belongs to the pool
         glDeleteVertexArrays(1, (self.vao,))
-        glDeleteBuffers(1,(self.vbo,))
 
 class ObjMesh(Mesh):
 
 
-    def __init__(self, filename):
+    def __init__(self, filename, pool):
 
-        super().__init__()
+        super().__init__(pool)
 
         # x, y, z, s, t, nx, ny, nz
         vertices = load_model_from_file(filename)
         self.vertex_count = len(vertices)//8
-        vertices = np.array(vertices, dtype=np.float32)
+        vertices = pack_vertex_data(vertices)
         
         glBindVertexArray(self.vao)
+        self.upload(vertices)
+        self.set_up_vertex_attributes()
+
+    def set_up_vertex_attributes(self):
+        """ Point the bound vao's vertex attributes at the mesh's vertex buffer. """
+
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
         #position
         glEnableVertexAttribArray(0)
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(0))
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(self.vbo_offset))
         #texture
         glEnableVertexAttribArray(1)
-        glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(12))
+        glVertexAttribPointer(1, 2, GL_HALF_FLOAT, GL_FALSE, 20, ctypes.c_void_p(self.vbo_offset + 12))
         #normal
         glEnableVertexAttribArray(2)
-        glVertexAttribPointer(2, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(20))
+        glVertexAttribPointer(2, 4, GL_INT_2_10_10_10_REV, GL_TRUE, 20, ctypes.c_void_p(self.vbo_offset + 16))
 
 
 class InstancedObjMesh(ObjMesh):
 
-    def __init__(self, filename):
-        super().__init__(filename)
+    def __init__(self, filename, pool):
+        super().__init__(filename, pool)
 
         self.vbo_instance = glGenBuffers(1)
 
-    def send_instance_data(self, data):
+        #one vao per region of the instance buffer, so switching
+        #regions is a vao bind rather than re-pointing the attributes
+        self.instance_vaos = [self.vao] + [
+            glGenVertexArrays(1) for _ in range(INSTANCE_BUFFER_FRAMES - 1)
+        ]
+        for vao in self.instance_vaos[1:]:
+            glBindVertexArray(vao)
+            self.set_up_vertex_attributes()
+
+        #transforms are built in here, then copied into the instance buffer
+        self.instance_capacity = 0
+        self.instance_scratch = None
+
+        #the instance buffer is a ring of INSTANCE_BUFFER_FRAMES regions,
+        #a fence per region marks when the GPU is done reading it
+        self.instance_frame = 0
+        self.instance_fences = [None] * INSTANCE_BUFFER_FRAMES
+        self.grow_instances(256)
+
+    def grow_instances(self, count):
+        """
+            Make room for at least the given number of instances,
+            doubling the scratch array and instance buffer as needed.
+        """
+
+        capacity = max(1, self.instance_capacity)
+        while capacity < count:
+            capacity *= 2
+        self.instance_capacity = capacity
+
+        self.instance_scratch = np.empty((capacity, 4, 4), dtype=np.float32)
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo_instance)
-        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STATIC_DRAW)
+        glBufferData(
+            GL_ARRAY_BUFFER, INSTANCE_BUFFER_FRAMES * self.instance_scratch.nbytes,
+            None, GL_STREAM_DRAW
+        )
 
-        glBindVertexArray(self.vao)
-        # Instances
+        #the old storage is orphaned, nothing has to wait on it
+        self.delete_instance_fences()
+
+        #the regions have moved
+        for region, vao in enumerate(self.instance_vaos):
+            glBindVertexArray(vao)
+            self.set_up_instance_attributes(region * self.instance_scratch.nbytes)
+
+    def set_up_instance_attributes(self, offset):
+        """
+            Point the bound vao's per instance attributes (the four
+            rows of the model transform) at the given offset into
+            the instance buffer.
+        """
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo_instance)
         glEnableVertexAttribArray(3)
-        glVertexAttribPointer(3, 4, GL_FLOAT, GL_FALSE, 64, ctypes.c_void_p(0))
+        glVertexAttribPointer(3, 4, GL_FLOAT, GL_FALSE, 64, ctypes.c_void_p(offset))
         glEnableVertexAttribArray(4)
-        glVertexAttribPointer(4, 4, GL_FLOAT, GL_FALSE, 64, ctypes.c_void_p(16))
+        glVertexAttribPointer(4, 4, GL_FLOAT, GL_FALSE, 64, ctypes.c_void_p(offset + 16))
         glEnableVertexAttribArray(5)
-        glVertexAttribPointer(5, 4, GL_FLOAT, GL_FALSE, 64, ctypes.c_void_p(32))
+        glVertexAttribPointer(5, 4, GL_FLOAT, GL_FALSE, 64, ctypes.c_void_p(offset + 32))
         glEnableVertexAttribArray(6)
-        glVertexAttribPointer(6, 4, GL_FLOAT, GL_FALSE, 64, ctypes.c_void_p(48))
+        glVertexAttribPointer(6, 4, GL_FLOAT, GL_FALSE, 64, ctypes.c_void_p(offset + 48))
 
         glVertexAttribDivisor(3, 1)
         glVertexAttribDivisor(4, 1)
         glVertexAttribDivisor(5, 1)
         glVertexAttribDivisor(6, 1)
 
-        glBindVertexArray(0)
+    def reserve_instances(self, count):
+        """ Returns the first count rows of the scratch array, growing it if needed. """
+
+        if count > self.instance_capacity:
+            self.grow_instances(count)
+        
+        return self.instance_scratch[:count]
+
+    def send_instance_data(self, count):
+        """
+            Copy the first count transforms of the scratch array
+            into this frame's region of the instance buffer.
+
+            The region is mapped unsynchronized, once the fence
+            from the last time it was drawn from has signalled,
+            so the driver never has to stall or copy.
+        """
+
+        #every draw reading the previous region has been issued by now
+        previous = (self.instance_frame - 1) % INSTANCE_BUFFER_FRAMES
+        if self.instance_fences[previous] is None:
+            self.instance_fences[previous] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+
+        region = self.instance_frame % INSTANCE_BUFFER_FRAMES
+        self.instance_frame += 1
+        fence = self.instance_fences[region]
+        if fence is not None:
+            while glClientWaitSync(
+                fence, GL_SYNC_FLUSH_COMMANDS_BIT, 1000000000) == GL_TIMEOUT_EXPIRED:
+                pass
+            glDeleteSync(fence)
+            self.instance_fences[region] = None
+
+        offset = region * self.instance_scratch.nbytes
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo_instance)
+        if count > 0:
+            pointer = glMapBufferRange(
+                GL_ARRAY_BUFFER, offset, 64 * count,
+                GL_MAP_WRITE_BIT | GL_MAP_INVALIDATE_RANGE_BIT | GL_MAP_UNSYNCHRONIZED_BIT
+            )
+            ctypes.memmove(pointer, self.instance_scratch.ctypes.data, 64 * count)
+            glUnmapBuffer(GL_ARRAY_BUFFER)
+
+        glBindVertexArray(self.instance_vaos[region])
+
+    def delete_instance_fences(self):
+
+        for region, fence in enumerate(self.instance_fences):
+            if fence is not None:
+                glDeleteSync(fence)
+                self.instance_fences[region] = None
+
+    def destroy(self):
+
+        self.delete_instance_fences()
+        glDeleteVertexArrays(len(self.instance_vaos) - 1, self.instance_vaos[1:])
+        glDeleteBuffers(1, (self.vbo_instance,))
+        super().destroy()
 
 class Quad2D(Mesh):
 
 
-    def __init__(self, center: tuple[float], size: tuple[float]):
+    def __init__(self, center: tuple[float], size: tuple[float], pool: BufferPool):
 
-        super().__init__()
+        super().__init__(pool)
 
         # x, y
         x,y = center
         w,h = size
+        #drawn as a triangle strip, both triangles counter clockwise
         vertices = (
-            x + w, y - h,
             x - w, y - h,
-            x - w, y + h,
-            
+            x + w, y - h,
             x - w, y + h,
             x + w, y + h,
-            x + w, y - h,
         )
-        self.vertex_count = 6
+        self.vertex_count = 4
         vertices = np.array(vertices, dtype=np.float32)
 
         glBindVertexArray(self.vao)
+        self.upload(vertices)
+        self.set_up_vertex_attributes()
+
+    def set_up_vertex_attributes(self):
+        """ Point the bound vao's vertex attributes at the mesh's vertex buffer. """
+
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
         #position
         glEnableVertexAttribArray(0)
-        glVertexAttribPointer(0, 2, GL_FLOAT, GL_FALSE, 8, ctypes.c_void_p(0))
+        glVertexAttribPointer(0, 2, GL_FLOAT, GL_FALSE, 8, ctypes.c_void_p(self.vbo_offset))
 
 class Material:
 
@@ -302,23 +514,59 @@ class Material:
     def destroy(self):
         glDeleteTextures(1, (self.texture,))
 
-class Material2D(Material):
+class MaterialArray(Material):
+    """
+        Several images in the layers of one 2D texture array, so
+        materials can be switched by layer without rebinding textures.
+    """
 
     
-    def __init__(self, filepath):
+    def __init__(self, filepaths: list[str]):
         
-        super().__init__(GL_TEXTURE_2D, 1)
+        super().__init__(GL_TEXTURE_2D_ARRAY, 1)
+
+        #layer of each image, in the order they were given
+        self.layers = {filepath: layer for layer, filepath in enumerate(filepaths)}
         
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST_MIPMAP_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-        with Image.open(filepath, mode = "r") as image:
-            image_width,image_height = image.size
-            image = image.convert("RGBA")
-            img_data = bytes(image.tobytes())
-            glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA,image_width,image_height,0,GL_RGBA,GL_UNSIGNED_BYTE,img_data)
-        glGenerateMipmap(GL_TEXTURE_2D)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_S, GL_REPEAT)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_T, GL_REPEAT)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MIN_FILTER, GL_NEAREST_MIPMAP_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+
+        images = []
+        for filepath in filepaths:
+            with Image.open(filepath, mode = "r") as image:
+                image.load()
+                images.append(image)
+
+        #layers all have the size of the smallest image, larger
+        #images are shrunk to fit rather than the small ones stretched
+        image_width = min(image.size[0] for image in images)
+        image_height = min(image.size[1] for image in images)
+
+        #three bytes per texel, unless some image has alpha
+        if any(
+            image.mode in ("RGBA", "LA") or "transparency" in image.info
+            for image in images):
+            mode, internal_format, pixel_format = "RGBA", GL_RGBA8, GL_RGBA
+        else:
+            mode, internal_format, pixel_format = "RGB", GL_RGB8, GL_RGB
+
+        #rgb rows aren't always a multiple of 4 bytes long
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        if texture_storage_supported():
+            levels = max(image_width, image_height).bit_length()
+            glTexStorage3D(GL_TEXTURE_2D_ARRAY,levels,internal_format,image_width,image_height,len(images))
+        else:
+            glTexImage3D(GL_TEXTURE_2D_ARRAY,0,internal_format,image_width,image_height,len(images),0,pixel_format,GL_UNSIGNED_BYTE,None)
+
+        for layer, image in enumerate(images):
+            image = image.convert(mode)
+            if image.size != (image_width, image_height):
+                image = image.resize((image_width, image_height), Image.BICUBIC)
+            img_data = image.tobytes()
+            glTexSubImage3D(GL_TEXTURE_2D_ARRAY,0,0,0,layer,image_width,image_height,1,pixel_format,GL_UNSIGNED_BYTE,img_data)
+        glGenerateMipmap(GL_TEXTURE_2D_ARRAY)
 
 class MaterialCubemap(Material):
 
@@ -333,44 +581,40 @@ class MaterialCubemap(Material):
         glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
         glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
 
-        #load textures
-        with Image.open(f"{filepath}_left.png", mode = "r") as img:
-            image_width,image_height = img.size
-            img = img.convert('RGBA')
-            img_data = bytes(img.tobytes())
-            glTexImage2D(GL_TEXTURE_CUBE_MAP_NEGATIVE_Y,0,GL_RGBA8,image_width,image_height,0,GL_RGBA,GL_UNSIGNED_BYTE,img_data)
-        
-        with Image.open(f"{filepath}_right.png", mode = "r") as img:
-            image_width,image_height = img.size
-            img = ImageOps.flip(img)
-            img = ImageOps.mirror(img)
-            img = img.convert('RGBA')
-            img_data = bytes(img.tobytes())
-            glTexImage2D(GL_TEXTURE_CUBE_MAP_POSITIVE_Y,0,GL_RGBA8,image_width,image_height,0,GL_RGBA,GL_UNSIGNED_BYTE,img_data)
-        
-        with Image.open(f"{filepath}_top.png", mode = "r") as img:
-            image_width,image_height = img.size
-            img = img.rotate(90)
-            img = img.convert('RGBA')
-            img_data = bytes(img.tobytes())
-            glTexImage2D(GL_TEXTURE_CUBE_MAP_POSITIVE_Z,0,GL_RGBA8,image_width,image_height,0,GL_RGBA,GL_UNSIGNED_BYTE,img_data)
-
-        with Image.open(f"{filepath}_bottom.png", mode = "r") as img:
-            image_width,image_height = img.size
-            img = img.convert('RGBA')
-            img_data = bytes(img.tobytes())
-            glTexImage2D(GL_TEXTURE_CUBE_MAP_NEGATIVE_Z,0,GL_RGBA8,image_width,image_height,0,GL_RGBA,GL_UNSIGNED_BYTE,img_data)
-        
-        with Image.open(f"{filepath}_back.png", mode = "r") as img:
-            image_width,image_height = img.size
-            img = img.rotate(-90)
-            img = img.convert('RGBA')
-            img_data = bytes(img.tobytes())
-            glTexImage2D(GL_TEXTURE_CUBE_MAP_NEGATIVE_X,0,GL_RGBA8,image_width,image_height,0,GL_RGBA,GL_UNSIGNED_BYTE,img_data)
-
-        with Image.open(f"{filepath}_front.png", mode = "r") as img:
-            image_width,image_height = img.size
-            img = img.rotate(90)
-            img = img.convert('RGBA')
-            img_data = bytes(img.tobytes())
-            glTexImage2D(GL_TEXTURE_CUBE_MAP_POSITIVE_X,0,GL_RGBA8,image_width,image_height,0,GL_RGBA,GL_UNSIGNED_BYTE,img_data)
+        #each face's image, the cubemap face it goes on
+        #and how it has to be turned to line up with its neighbours
+        faces = (
+            ("left", GL_TEXTURE_CUBE_MAP_NEGATIVE_Y, lambda img: img),
+            ("right", GL_TEXTURE_CUBE_MAP_POSITIVE_Y,
+                lambda img: ImageOps.mirror(ImageOps.flip(img))),
+            ("top", GL_TEXTURE_CUBE_MAP_POSITIVE_Z, lambda img: img.rotate(90)),
+            ("bottom", GL_TEXTURE_CUBE_MAP_NEGATIVE_Z, lambda img: img),
+            ("back", GL_TEXTURE_CUBE_MAP_NEGATIVE_X, lambda img: img.rotate(-90)),
+            ("front", GL_TEXTURE_CUBE_MAP_POSITIVE_X, lambda img: img.rotate(90))
+        )
+        use_storage = texture_storage_supported()
+
+        def load_face(name, orient):
+            with Image.open(f"{filepath}_{name}.png", mode = "r") as img:
+                img = orient(img)
+                img = img.convert('RGBA')
+                return img.size, img.tobytes()
+
+        #decoding releases the GIL, so the faces load in parallel,
+        #then get uploaded here since the context belongs to this thread
+        with ThreadPoolExecutor(max_workers = len(faces)) as executor:
+            images = executor.map(
+                load_face,
+                [name for name, _, _ in faces],
+                [orient for _, _, orient in faces]
+            )
+
+            for i, ((_, target, _), (size, img_data)) in enumerate(zip(faces, images)):
+                image_width,image_height = size
+                if not use_storage:
+                    glTexImage2D(target,0,GL_RGBA8,image_width,image_height,0,GL_RGBA,GL_UNSIGNED_BYTE,img_data)
+                    continue
+                #the faces share one immutable allocation
+                if i == 0:
+                    glTexStorage2D(GL_TEXTURE_CUBE_MAP,1,GL_RGBA8,image_width,image_height)
+                glTexSubImage2D(target,0,0,0,image_width,image_height,GL_RGBA,GL_UNSIGNED_BYTE,img_data)